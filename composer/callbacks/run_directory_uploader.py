@@ -16,7 +16,6 @@ import time
 import uuid
 from typing import Callable, Optional, Tuple, Type, Union
 
-from libcloud.common.types import LibcloudError
 from requests.exceptions import ConnectionError
 from urllib3.exceptions import ProtocolError
 
@@ -294,6 +293,9 @@ def _upload_worker(
         object_name_prefix (str): Prefix to prepend to the object names
              before they are uploaded to the blob store.
     """
+    # libcloud is only imported when the worker starts, so importing composer does not import it
+    from libcloud.common.types import LibcloudError
+
     provider = object_store_hparams.initialize_object()
     while True:
         try:
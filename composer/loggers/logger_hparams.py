@@ -267,6 +267,11 @@ class ObjectStoreLoggerHparams(LoggerDestinationHparams):
         num_concurrent_uploads (int, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
         upload_staging_folder (str, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
         use_procs (bool, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
+        staging_mode (str, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
+        use_boto3_transfer (bool, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
+        small_file_coalesce_bytes (int, optional): See
+            :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
+        dedupe_by_content (bool, optional): See :class:`~composer.loggers.object_store_logger.ObjectStoreLogger`.
     """
     object_store_hparams: ObjectStoreHparams = hp.required("Object store provider hparams.")
     should_log_artifact: Optional[str] = hp.optional(
@@ -277,6 +282,13 @@ class ObjectStoreLoggerHparams(LoggerDestinationHparams):
                                   default=True)
     upload_staging_folder: Optional[str] = hp.optional(
         "Staging folder for uploads. If not specified, will use a temporary directory.", default=None)
+    staging_mode: str = hp.optional("How to stage artifacts for upload. One of 'link', 'reflink', or 'copy'.",
+                                    default='reflink')
+    use_boto3_transfer: bool = hp.optional("Whether to upload to S3 with boto3 managed transfers.", default=False)
+    small_file_coalesce_bytes: int = hp.optional(
+        "If positive, artifacts smaller than this many bytes are uploaded together in tarballs.", default=0)
+    dedupe_by_content: bool = hp.optional("Whether to skip uploading artifacts whose contents have not changed.",
+                                          default=False)
 
     def initialize_object(self, config: Optional[Dict[str, Any]] = None) -> ObjectStoreLogger:
         return ObjectStoreLogger(
@@ -289,6 +301,10 @@ class ObjectStoreLoggerHparams(LoggerDestinationHparams):
             num_concurrent_uploads=self.num_concurrent_uploads,
             upload_staging_folder=self.upload_staging_folder,
             use_procs=self.use_procs,
+            staging_mode=self.staging_mode,
+            use_boto3_transfer=self.use_boto3_transfer,
+            small_file_coalesce_bytes=self.small_file_coalesce_bytes,
+            dedupe_by_content=self.dedupe_by_content,
         )
 
 
@@ -4,35 +4,52 @@
 
 from __future__ import annotations
 
+import collections
+import ctypes
+import heapq
+import http.client
+import itertools
+import json
 import logging
 import multiprocessing
 import os
 import pathlib
 import queue
+import random
+import select
 import shutil
+import sys
+import tarfile
 import tempfile
 import textwrap
 import threading
 import time
+import urllib.parse
 import uuid
-from multiprocessing.context import SpawnProcess
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
-
-from libcloud.common.types import LibcloudError
-from libcloud.storage.types import ObjectDoesNotExistError
-from requests.exceptions import ConnectionError
-from urllib3.exceptions import ProtocolError
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type, Union
 
 from composer.core.state import State
 from composer.loggers.logger import Logger, LogLevel
 from composer.loggers.logger_destination import LoggerDestination
-from composer.utils import dist
+from composer.utils import MissingConditionalImportError, dist
 from composer.utils.object_store import ObjectStore
 
 log = logging.getLogger(__name__)
 
 __all__ = ["ObjectStoreLogger"]
 
+_FICLONE = 0x40049409  # ioctl request code from linux/fs.h
+_ARTIFACT_NAME_PLACEHOLDER = "\0ARTIFACT\0"
+_MAX_S3_PUT_OBJECT_SIZE = 5 * 1024**3  # Larger objects must be uploaded in multiple parts
+_HTTP_BLOCKSIZE = 1024 * 1024
+_COALESCED_BATCH_MAX_AGE = 2.0  # seconds
+_MAX_UPLOAD_RETRIES = 4
+_OBJECT_LISTING_TTL = 30.0  # seconds
+# Numbers the staged files of all loggers in this process
+_staging_counter = itertools.count()
+
 
 def _always_log(state: State, log_level: LogLevel, artifact_name: str):
     """Function that can be passed into ``should_log_artifact`` to log all artifacts."""
@@ -93,11 +110,18 @@ class ObjectStoreLogger(LoggerDestination):
 
     .. note::
 
-        This callback blocks the training loop to copy each artifact where ``should_log_artifact`` returns ``True``, as
+        This callback blocks the training loop to stage each artifact where ``should_log_artifact`` returns ``True``, as
         the uploading happens in the background. Here are some additional tips for minimizing the performance impact:
 
         *   Set ``should_log`` to filter which artifacts will be logged. By default, all artifacts are logged.
 
+        *   Place the ``upload_staging_folder`` on the same filesystem as the artifacts. On filesystems that support
+            copy-on-write clones (e.g. btrfs or XFS), artifacts are then staged without copying any data. If the
+            artifacts are never modified in place after being logged, set ``staging_mode='link'`` to stage via
+            hardlinks on filesystems without copy-on-write support. Staging is performed with system calls
+            (``link``, ``ioctl``, ``copy_file_range``, or ``sendfile``) that release the GIL, so other Python threads
+            are not blocked while an artifact is staged.
+
         *   Set ``use_procs=True`` (the default) to use background processes, instead of threads, to perform the file
             uploads. Processes are recommended to ensure that the GIL is not blocking the training loop when
             performing CPU operations on uploaded files (e.g. computing and comparing checksums). Network I/O happens
@@ -107,6 +131,15 @@ class ObjectStoreLogger(LoggerDestination):
             faster than writing to disk. However, there must have sufficient excess RAM, or :exc:`MemoryError`\\s may
             be raised.
 
+    .. note::
+
+        Before uploading an artifact that was logged with ``overwrite=False``, the upload worker checks whether the
+        object already exists. For S3-compatible providers, each worker lists the objects under the artifact's prefix
+        and caches the listing for 30 seconds, rather than checking every object individually. Each worker has its own
+        cache, so an object that was uploaded within the last 30 seconds by another worker (or by another process)
+        may not be detected, in which case it will be overwritten. For other providers, and for objects at the root
+        of the container, each object is checked individually.
+
     Args:
         provider (str): Cloud provider to use. Valid options are:
 
@@ -232,7 +265,38 @@ class ObjectStoreLogger(LoggerDestination):
         upload_staging_folder (str, optional): A folder to use for staging uploads.
             If not specified, defaults to using a :func:`~tempfile.TemporaryDirectory`.
         use_procs (bool, optional): Whether to perform file uploads in background processes (as opposed to threads).
+            On Linux, the processes are started with the ``'forkserver'`` start method; elsewhere, with ``'spawn'``.
             Defaults to True.
+        staging_mode (str, optional): How artifacts are staged in the ``upload_staging_folder``. Valid options are:
+
+            * ``'link'``: Hardlink the artifact into the staging folder. This is the fastest option, but the staged
+              file is not a snapshot; if the artifact is modified in place before it is uploaded, then the
+              modified contents will be uploaded. Falls back to ``'reflink'`` if a hardlink cannot be created
+              (e.g. if the staging folder is on a different filesystem).
+            * ``'reflink'``: Clone the artifact with a copy-on-write reflink, or an in-kernel
+              :func:`os.copy_file_range`, falling back to ``'copy'`` if neither is supported.
+            * ``'copy'``: Copy the artifact with :func:`shutil.copy2`.
+
+            Defaults to ``'reflink'``.
+        use_boto3_transfer (bool, optional): Whether to upload to S3 with :mod:`boto3`'s managed transfers, instead of
+            with libcloud. Managed transfers split large files into parts that are uploaded concurrently, which
+            is significantly faster for large artifacts such as checkpoints. Requires :mod:`boto3`, and is ignored
+            for providers other than ``'s3'``. Defaults to False.
+        small_file_coalesce_bytes (int, optional): If positive, artifacts smaller than this many bytes are not
+            uploaded individually. Instead, each upload worker appends them to a tarball, which is uploaded once it
+            reaches this size, or after two seconds. Each tarball is uploaded as
+            ``<prefix>coalesced_artifacts/<uuid>.tar``, where ``<prefix>`` is the part of ``object_name_format`` that
+            precedes ``{artifact_name}``, alongside a ``<uuid>.index.json`` object. The index maps each object name to
+            the ``offset`` and ``size`` of its contents within the tarball.
+
+            Coalescing reduces the per-request overhead of uploading many tiny artifacts, but coalesced artifacts
+            are not available at :meth:`get_uri_for_artifact`. Artifacts logged with ``overwrite=False`` are always
+            uploaded individually. Defaults to 0 (disabled).
+        dedupe_by_content (bool, optional): Whether to skip uploading an artifact if its contents are identical to
+            the contents last uploaded to the same object name by this logger (e.g. an unchanged checkpoint that is
+            logged every epoch). Contents are compared with a :mod:`xxhash` ``xxh3_64`` hash, which is computed on the
+            training loop thread. Artifacts logged with ``overwrite=False`` are always uploaded. Requires :mod:`xxhash`.
+            Defaults to False.
     """
 
     def __init__(
@@ -245,6 +309,10 @@ class ObjectStoreLogger(LoggerDestination):
         num_concurrent_uploads: int = 4,
         upload_staging_folder: Optional[str] = None,
         use_procs: bool = True,
+        staging_mode: str = 'reflink',
+        use_boto3_transfer: bool = False,
+        small_file_coalesce_bytes: int = 0,
+        dedupe_by_content: bool = False,
     ) -> None:
         self.provider = provider
         self.container = container
@@ -254,6 +322,33 @@ class ObjectStoreLogger(LoggerDestination):
         self.should_log_artifact = should_log_artifact
         self.object_name_format = object_name_format
         self._run_name = None
+        # The rank and world size format variables, which are constant after Event.INIT
+        self._dist_fields: Dict[str, int] = {}
+        # The parts of the object name before and after the ``{artifact_name}``, which are constant after Event.INIT
+        self._object_name_affixes: Optional[Tuple[str, str]] = None
+
+        if staging_mode not in ('link', 'reflink', 'copy'):
+            raise ValueError(f"staging_mode must be one of 'link', 'reflink', or 'copy', not {staging_mode!r}.")
+        self._staging_mode = staging_mode
+
+        if use_boto3_transfer and provider == 's3':
+            try:
+                import boto3
+            except ImportError as e:
+                raise MissingConditionalImportError(extra_deps_group="boto3", conda_package="boto3") from e
+            del boto3  # unused
+        self._use_boto3_transfer = use_boto3_transfer and provider == 's3'
+        self._small_file_coalesce_bytes = small_file_coalesce_bytes
+
+        if dedupe_by_content:
+            try:
+                import xxhash
+            except ImportError as e:
+                raise MissingConditionalImportError(extra_deps_group="xxhash", conda_package="python-xxhash") from e
+            del xxhash  # unused
+        self._dedupe_by_content = dedupe_by_content
+        # Object name -> hash of the contents last uploaded to it
+        self._last_hash: Dict[str, int] = {}
 
         if upload_staging_folder is None:
             self._tempdir = tempfile.TemporaryDirectory()
@@ -261,48 +356,128 @@ class ObjectStoreLogger(LoggerDestination):
         else:
             self._tempdir = None
             self._upload_staging_folder = upload_staging_folder
+            os.makedirs(self._upload_staging_folder, exist_ok=True)
+        # Staged files are named with a random token, which is unique to this logger, and a counter. The token
+        # disambiguates between loggers -- in the same process, or on different nodes -- that share an
+        # ``upload_staging_folder``.
+        self._staging_token = uuid.uuid4().hex
 
         if num_concurrent_uploads < 1:
             raise ValueError("num_concurrent_uploads must be >= 1. Blocking uploads are not supported.")
         self._num_concurrent_uploads = num_concurrent_uploads
 
+        # Each worker reads from its own channel -- a pipe for processes, or a deque for threads -- which avoids
+        # contending on the lock of a queue shared between the workers. Each artifact is dispatched to the live worker
+        # with the fewest outstanding entries, so idle workers are preferred over a worker that is uploading a large
+        # file. Ties are broken round-robin.
+        self._use_procs = use_procs
+        self._file_deques: List[_FileDeque] = []
+        self._pipe_recv_conns: List[Connection] = []
+        self._pipe_send_conns: List[Connection] = []
+        # Polls whether each pipe has room for an entry. Unavailable on Windows.
+        self._pipe_pollers: List[Any] = []
+        self._next_worker_idx = 0
+        # The number of entries dispatched to each worker, and the number of entries that each worker has finished
+        # handling. The difference is the number of outstanding entries for the worker.
+        self._num_dispatched = [0] * num_concurrent_uploads
+        self._num_done: List[ctypes.c_uint64] = []
+        # Entries that could not yet be dispatched without blocking the training loop, in the order they were logged
+        self._undispatched: collections.deque[Union[bytes, Tuple[str, str, bool]]] = collections.deque()
         if use_procs:
-            mp_ctx = multiprocessing.get_context('spawn')
-            self._file_upload_queue: Union[queue.Queue[Tuple[str, str, bool]],
-                                           multiprocessing.JoinableQueue[Tuple[str, str,
-                                                                               bool]]] = mp_ctx.JoinableQueue()
+            if sys.platform == 'linux':
+                # Workers are forked from a server process that imports the heavy modules once, rather than
+                # re-importing composer (and torch) in every spawned worker
+                mp_ctx = multiprocessing.get_context('forkserver')
+                mp_ctx.set_forkserver_preload(
+                    ['composer.loggers.object_store_logger', 'libcloud.storage.providers', 'boto3'])
+            else:
+                mp_ctx = multiprocessing.get_context('spawn')
+            for _ in range(num_concurrent_uploads):
+                recv_conn, send_conn = mp_ctx.Pipe(duplex=False)
+                self._pipe_recv_conns.append(recv_conn)
+                self._pipe_send_conns.append(send_conn)
+                if hasattr(select, 'poll'):
+                    poller = select.poll()
+                    poller.register(send_conn.fileno(), select.POLLOUT)
+                    self._pipe_pollers.append(poller)
+            self._num_done = [mp_ctx.RawValue(ctypes.c_uint64, 0) for _ in range(num_concurrent_uploads)]
             self._finished_cls: Union[Callable[[], multiprocessing._EventType], Type[threading.Event]] = mp_ctx.Event
             self._proc_class = mp_ctx.Process
         else:
-            self._file_upload_queue = queue.Queue()
+            self._file_deques = [_FileDeque() for _ in range(num_concurrent_uploads)]
+            self._num_done = [ctypes.c_uint64(0) for _ in range(num_concurrent_uploads)]
             self._finished_cls = threading.Event
             self._proc_class = threading.Thread
         self._finished: Optional[Union[multiprocessing._EventType, threading.Event]] = None
-        self._workers: List[Union[SpawnProcess, threading.Thread]] = []
+        self._workers: List[Union[BaseProcess, threading.Thread]] = []
 
     def init(self, state: State, logger: Logger) -> None:
         del state  # unused
         if self._finished is not None:
             raise RuntimeError("The ObjectStoreLogger is already initialized.")
         self._finished = self._finished_cls()
+        # The staging folder is created once in __init__, so log_file_artifact does not need to create it
+        assert os.path.isdir(self._upload_staging_folder), "the upload staging folder should exist"
         self._run_name = logger.run_name
-        object_name_to_test = self._format_object_name(".credentials_validated_successfully")
-        _validate_credentials(self.provider, self.container, self.provider_kwargs, object_name_to_test)
+        self._dist_fields = dict(
+            rank=dist.get_global_rank(),
+            local_rank=dist.get_local_rank(),
+            world_size=dist.get_world_size(),
+            local_world_size=dist.get_local_world_size(),
+            node_rank=dist.get_node_rank(),
+        )
+        object_name_affixes = self.object_name_format.format(
+            artifact_name=_ARTIFACT_NAME_PLACEHOLDER,
+            run_name=self._run_name,
+            **self._dist_fields,
+        ).split(_ARTIFACT_NAME_PLACEHOLDER)
+        # Only precompile if ``{artifact_name}`` appears exactly once, without a format spec or conversion
+        if len(object_name_affixes) == 2 and self.object_name_format.count("{artifact_name}") == 1:
+            self._object_name_affixes = (object_name_affixes[0], object_name_affixes[1])
         assert len(self._workers) == 0, "workers should be empty if self._finished was None"
-        for _ in range(self._num_concurrent_uploads):
+        coalesced_object_name_prefix = ''
+        if self._object_name_affixes is not None:
+            coalesced_object_name_prefix = self._object_name_affixes[0].lstrip('/')
+        if not self._use_procs:
+            # Thread workers share this interpreter. Import libcloud before starting them, as concurrently
+            # running its first import from the workers and the credential validation below can deadlock.
+            import libcloud.storage.providers
+            del libcloud
+        for i in range(self._num_concurrent_uploads):
+            file_queue = self._pipe_recv_conns[i] if self._use_procs else self._file_deques[i]
             worker = self._proc_class(
                 target=_upload_worker,
                 kwargs={
-                    "file_queue": self._file_upload_queue,
+                    "file_queue": file_queue,
                     "is_finished": self._finished,
+                    "num_done": self._num_done[i],
                     "provider": self.provider,
                     "container": self.container,
                     "provider_kwargs": self.provider_kwargs,
+                    "use_boto3_transfer": self._use_boto3_transfer,
+                    "tune_http": self._use_procs,
+                    "small_file_coalesce_bytes": self._small_file_coalesce_bytes,
+                    "coalesced_object_name_prefix": coalesced_object_name_prefix,
                 },
             )
             worker.start()
             self._workers.append(worker)
 
+        # Validate the credentials while the workers are starting up, rather than before starting them,
+        # so the worker startup time overlaps with the validation round trip.
+        object_name_to_test = self._format_object_name(".credentials_validated_successfully")
+        try:
+            _validate_credentials(self.provider, self.container, self.provider_kwargs, object_name_to_test)
+        except Exception:
+            # Do not leave the workers running if the credentials are invalid
+            self._finished.set()
+            for worker in self._workers:
+                worker.join()
+            self._workers.clear()
+            raise
+        # Dispatch any artifacts that were logged before the workers started
+        self._dispatch_undispatched()
+
     def batch_end(self, state: State, logger: Logger) -> None:
         del state, logger  # unused
         self._check_workers()
@@ -319,27 +494,140 @@ class ObjectStoreLogger(LoggerDestination):
         for worker in self._workers:
             if not worker.is_alive():
                 raise RuntimeError("Upload worker crashed. Please check the logs.")
+        self._dispatch_undispatched()
 
     def log_file_artifact(self, state: State, log_level: LogLevel, artifact_name: str, file_path: pathlib.Path, *,
                           overwrite: bool):
         if not self.should_log_artifact(state, log_level, artifact_name):
             return
-        copied_path = os.path.join(self._upload_staging_folder, str(uuid.uuid4()))
-        copied_path_dirname = os.path.dirname(copied_path)
-        os.makedirs(copied_path_dirname, exist_ok=True)
-        shutil.copy2(file_path, copied_path)
+        copied_path = os.path.join(self._upload_staging_folder, f"{self._staging_token}-{next(_staging_counter)}")
+        _stage_file(str(file_path), copied_path, self._staging_mode)
         object_name = self._format_object_name(artifact_name)
-        self._file_upload_queue.put_nowait((copied_path, object_name, overwrite))
+        # Artifacts logged with overwrite=False are not deduplicated, so the worker still raises if the object exists
+        if self._dedupe_by_content and overwrite:
+            # Hashing the staged file, rather than the original, ensures the hash matches what is uploaded
+            content_hash = _hash_file(copied_path)
+            if self._last_hash.get(object_name) == content_hash:
+                log.debug("Skipping upload of %s, as its contents have not changed", artifact_name)
+                os.remove(copied_path)
+                return
+            self._last_hash[object_name] = content_hash
+        if self._use_procs:
+            self._undispatched.append(_encode_file_entry(copied_path, object_name, overwrite))
+        else:
+            self._undispatched.append((copied_path, object_name, overwrite))
+        self._dispatch_undispatched()
+
+    def _dispatch_undispatched(self) -> None:
+        """Dispatch the undispatched entries in order, stopping at the first entry that cannot be dispatched.
+
+        Entries are only sent to workers whose pipe has room for them, so the training loop is never blocked on a
+        worker that is busy. Entries that cannot be dispatched are retried on the next call.
+        """
+        while len(self._undispatched) > 0 and self._dispatch(self._undispatched[0]):
+            self._undispatched.popleft()
+
+    def _dispatch(self, entry: Union[bytes, Tuple[str, str, bool]]) -> bool:
+        """Send ``entry`` to the live worker with the fewest outstanding entries, if any can take it without blocking.
+
+        Returns:
+            bool: Whether the entry was sent.
+        """
+        num_workers = len(self._workers)
+        worker_idxs = sorted(range(num_workers),
+                             key=lambda i: (self._num_dispatched[i] - self._num_done[i].value,
+                                            (i - self._next_worker_idx) % num_workers))
+        for worker_idx in worker_idxs:
+            if not self._workers[worker_idx].is_alive():
+                continue
+            if self._use_procs:
+                assert isinstance(entry, bytes)
+                if not self._can_send_without_blocking(worker_idx, entry):
+                    continue
+                self._pipe_send_conns[worker_idx].send_bytes(entry)
+            else:
+                assert isinstance(entry, tuple)
+                self._file_deques[worker_idx].put(entry)
+            self._num_dispatched[worker_idx] += 1
+            self._next_worker_idx = (worker_idx + 1) % num_workers
+            return True
+        return False
+
+    def _can_send_without_blocking(self, worker_idx: int, entry: bytes) -> bool:
+        """Whether ``entry`` can be sent to the pipe of a process worker without blocking."""
+        if self._num_dispatched[worker_idx] == self._num_done[worker_idx].value:
+            # The worker has finished handling every entry sent to it, so its pipe is empty
+            return True
+        if len(self._pipe_pollers) == 0:
+            return False
+        # The entry, with its 4 byte length header, is written atomically if it fits in ``PIPE_BUF`` bytes.
+        # The pipe is writable if an atomic write would not block.
+        return len(entry) + 4 <= select.PIPE_BUF and len(self._pipe_pollers[worker_idx].poll(0)) > 0
+
+    def _drain_worker_channel(self, worker_idx: int) -> List[Union[bytes, Tuple[str, str, bool]]]:
+        """Remove and return the entries that are queued for a worker, excluding shutdown sentinels."""
+        if not self._use_procs:
+            return list(self._file_deques[worker_idx].drain())
+        entries: List[Union[bytes, Tuple[str, str, bool]]] = []
+        recv_conn = self._pipe_recv_conns[worker_idx]
+        while recv_conn.poll(0):
+            entry = recv_conn.recv_bytes()
+            if len(entry) > 0:
+                entries.append(entry)
+        return entries
+
+    def _dispatch_all(self) -> None:
+        """Dispatch every undispatched entry, waiting for the workers to make room in their pipes.
+
+        The wait never blocks on a single worker, so a worker that crashes while its pipe is full cannot hang the
+        caller. Entries queued for crashed workers are given to the other workers. Returns once every entry is
+        dispatched, or once no workers are alive.
+        """
+        while True:
+            reclaimed_entries = []
+            for worker_idx, worker in enumerate(self._workers):
+                if not worker.is_alive():
+                    reclaimed_entries.extend(self._drain_worker_channel(worker_idx))
+            self._undispatched.extendleft(reversed(reclaimed_entries))
+            self._dispatch_undispatched()
+            live_worker_idxs = [i for i, worker in enumerate(self._workers) if worker.is_alive()]
+            if len(self._undispatched) == 0 or len(live_worker_idxs) == 0:
+                return
+            # Only process workers can be full. Wait for one of their pipes to have room, and then check again.
+            if len(self._pipe_pollers) == 0:
+                time.sleep(0.1)
+                continue
+            poller = select.poll()
+            for worker_idx in live_worker_idxs:
+                poller.register(self._pipe_send_conns[worker_idx].fileno(), select.POLLOUT)
+            poller.poll(100)
 
     def post_close(self):
         # Cleaning up on post_close to ensure that all artifacts are uploaded
+        num_not_uploaded = 0
         if self._finished is not None:
+            self._dispatch_all()
             self._finished.set()
-        for worker in self._workers:
-            worker.join()
+            # Wake up the workers, so they do not need to wait for the poll to time out. A worker whose pipe is full
+            # is not woken up, but it will see that ``self._finished`` is set once its pipe is empty.
+            for worker_idx, worker in enumerate(self._workers):
+                if self._use_procs and worker.is_alive() and self._can_send_without_blocking(worker_idx, b""):
+                    self._pipe_send_conns[worker_idx].send_bytes(b"")
+            for file_deque in self._file_deques:
+                file_deque.put(None)
+            for worker in self._workers:
+                worker.join()
+            # The workers only exit once their channels are empty, unless they crashed
+            num_not_uploaded = len(self._undispatched) + sum(
+                len(self._drain_worker_channel(i)) for i in range(len(self._workers)))
+        for conn in self._pipe_recv_conns + self._pipe_send_conns:
+            conn.close()
         if self._tempdir is not None:
             self._tempdir.cleanup()
         self._workers.clear()
+        if num_not_uploaded > 0:
+            raise RuntimeError(f"{num_not_uploaded} artifact(s) were not uploaded, as the upload workers crashed. "
+                               "Please check the logs.")
 
     def get_uri_for_artifact(self, artifact_name: str) -> str:
         """Get the object store provider uri for an artfact.
@@ -358,20 +646,91 @@ class ObjectStoreLogger(LoggerDestination):
         """Format the ``artifact_name`` according to the ``object_name_format_string``."""
         if self._run_name is None:
             raise RuntimeError("The run name is not set. It should have been set on Event.INIT.")
+        if self._object_name_affixes is not None:
+            prefix, suffix = self._object_name_affixes
+            return (prefix + artifact_name + suffix).lstrip('/')
+        # The format string does not contain exactly one ``{artifact_name}``, so it cannot be precompiled
         key_name = self.object_name_format.format(
-            rank=dist.get_global_rank(),
-            local_rank=dist.get_local_rank(),
-            world_size=dist.get_world_size(),
-            local_world_size=dist.get_local_world_size(),
-            node_rank=dist.get_node_rank(),
             artifact_name=artifact_name,
             run_name=self._run_name,
+            **self._dist_fields,
         )
         key_name = key_name.lstrip('/')
 
         return key_name
 
 
+def _stage_file(src: str, dst: str, staging_mode: str) -> None:
+    """Stage ``src`` at ``dst`` with the cheapest method permitted by ``staging_mode``.
+
+    See the ``staging_mode`` argument of :class:`ObjectStoreLogger` for the fallback order.
+    """
+    if staging_mode == 'link':
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            # e.g. EXDEV if the staging folder is on a different filesystem
+            pass
+    if staging_mode in ('link', 'reflink') and _clone_file(src, dst):
+        return
+    shutil.copy2(src, dst)
+
+
+def _clone_file(src: str, dst: str) -> bool:
+    """Clone ``src`` to ``dst`` without copying through userspace.
+
+    Attempts a copy-on-write ``FICLONE`` ioctl, and then :func:`os.copy_file_range`. Both are Linux-only.
+
+    Returns:
+        bool: Whether ``dst`` was created. If ``False``, then ``dst`` does not exist.
+    """
+    if sys.platform != 'linux':
+        return False
+    import fcntl
+
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            try:
+                fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+                return True
+            except OSError:
+                # The filesystem does not support reflinks, or the files are on different filesystems
+                pass
+            if hasattr(os, 'copy_file_range'):  # Python 3.8+
+                remaining = os.fstat(src_fd).st_size
+                try:
+                    while remaining > 0:
+                        copied = os.copy_file_range(src_fd, dst_fd, remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                except OSError:
+                    pass
+                else:
+                    if remaining == 0:
+                        return True
+        finally:
+            os.close(dst_fd)
+        os.remove(dst)
+        return False
+    finally:
+        os.close(src_fd)
+
+
+def _hash_file(file_path: str, chunk_size: int = 16 * 1024 * 1024) -> int:
+    """Compute the ``xxh3_64`` hash of ``file_path``, reading ``chunk_size`` bytes at a time."""
+    import xxhash
+
+    hasher = xxhash.xxh3_64()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.intdigest()
+
+
 def _validate_credentials(
     provider: str,
     container: str,
@@ -387,68 +746,442 @@ def _validate_credentials(
     )
 
 
+def _create_s3_client(provider_kwargs: Optional[Dict[str, Any]]):
+    """Create a :mod:`boto3` S3 client for the bucket described by the libcloud ``provider_kwargs``."""
+    import boto3
+    from botocore.config import Config
+
+    provider_kwargs = provider_kwargs or {}
+    endpoint_url = None
+    if provider_kwargs.get('host') is not None:
+        scheme = 'https' if provider_kwargs.get('secure', True) else 'http'
+        endpoint_url = f"{scheme}://{provider_kwargs['host']}"
+        if provider_kwargs.get('port') is not None:
+            endpoint_url += f":{provider_kwargs['port']}"
+    return boto3.client(
+        's3',
+        aws_access_key_id=provider_kwargs.get('key'),
+        aws_secret_access_key=provider_kwargs.get('secret'),
+        region_name=provider_kwargs.get('region'),
+        endpoint_url=endpoint_url,
+        config=Config(
+            max_pool_connections=32,
+            tcp_keepalive=True,
+            retries={
+                'max_attempts': 5,
+                'mode': 'standard'
+            },
+        ),
+    )
+
+
+def _sendfile_put_object(client, file_path: str, bucket: str, object_name: str) -> bool:
+    """Upload ``file_path`` to a plain-HTTP S3 endpoint with a single PUT, using :meth:`socket.socket.sendfile`.
+
+    The request is authorized with a presigned URL, which does not sign the payload. As such, the file can be
+    sent with ``sendfile(2)``, without copying it through userspace.
+
+    The client's ``connect_timeout`` applies to opening the connection, and its ``read_timeout`` to each send and
+    receive after that.
+
+    Returns:
+        bool: Whether the upload succeeded. On failure, a warning is logged.
+    """
+    url = urllib.parse.urlsplit(
+        client.generate_presigned_url('put_object', Params={
+            'Bucket': bucket,
+            'Key': object_name
+        }))
+    # Use the client's timeouts, so a stalled endpoint does not hang the worker
+    conn = http.client.HTTPConnection(url.netloc, timeout=client.meta.config.connect_timeout)
+    try:
+        with open(file_path, 'rb') as f:
+            conn.putrequest('PUT', f"{url.path}?{url.query}", skip_accept_encoding=True)
+            conn.putheader('Content-Length', str(os.fstat(f.fileno()).st_size))
+            conn.endheaders()
+            assert conn.sock is not None, "the connection is opened by endheaders()"
+            conn.sock.settimeout(client.meta.config.read_timeout)
+            conn.sock.sendfile(f)
+        response = conn.getresponse()
+        response.read()
+    except (OSError, http.client.HTTPException) as e:
+        log.warning("Zero-copy upload of %s failed", file_path, exc_info=e)
+        return False
+    finally:
+        conn.close()
+    if response.status != 200:
+        log.warning("Zero-copy upload of %s failed with HTTP %s %s", file_path, response.status, response.reason)
+        return False
+    return True
+
+
+class _S3TransferUploader:
+    """Uploads files with a :mod:`boto3` transfer manager without waiting for each upload to finish.
+
+    Up to ``max_inflight`` files are uploaded at once. Whenever an upload completes, its staged file is removed, and
+    the next file can be submitted immediately.
+
+    If the endpoint uses plain HTTP (e.g. an endpoint within a VPC), files that fit in a single PUT are instead
+    uploaded with :func:`_sendfile_put_object`, which sends the file from the page cache directly to the socket.
+
+    Args:
+        provider_kwargs (Dict[str, Any], optional): The libcloud provider kwargs for the S3 bucket.
+        container (str): The bucket name.
+        max_inflight (int, optional): The maximum number of files to upload concurrently. (default: ``16``)
+    """
+
+    def __init__(self, provider_kwargs: Optional[Dict[str, Any]], container: str, max_inflight: int = 16) -> None:
+        from boto3.s3.transfer import TransferConfig
+        from s3transfer.manager import TransferManager
+        from s3transfer.subscribers import BaseSubscriber
+
+        self._client = _create_s3_client(provider_kwargs)
+        # Construct the transfer manager directly, rather than with ``boto3.s3.transfer.create_transfer_manager``,
+        # which may return a CRT-based manager that ignores the transfer config
+        self._transfer_manager = TransferManager(
+            self._client,
+            TransferConfig(
+                multipart_threshold=8 * 1024 * 1024,
+                multipart_chunksize=16 * 1024 * 1024,
+                max_concurrency=8,
+                use_threads=True,
+            ),
+        )
+        self._container = container
+        self._use_sendfile = self._client.meta.endpoint_url.startswith("http://")
+        self._max_inflight = max_inflight
+        self._num_inflight = 0
+        done_queue = queue.Queue()
+        self._done_queue = done_queue
+
+        class _OnDoneSubscriber(BaseSubscriber):
+
+            def on_done(self, future, **kwargs):
+                del kwargs  # unused
+                done_queue.put(future)
+
+        self._subscriber = _OnDoneSubscriber()
+
+    def submit(self, file_path: str, object_name: str) -> None:
+        """Start uploading ``file_path``, blocking only if ``max_inflight`` uploads are already in progress."""
+        if self._use_sendfile and os.path.getsize(file_path) <= _MAX_S3_PUT_OBJECT_SIZE:
+            if _sendfile_put_object(self._client, file_path, self._container, object_name):
+                os.remove(file_path)
+                return
+            # Fall back to the transfer manager, which retries transient errors
+        if self._num_inflight >= self._max_inflight:
+            self.reap(block=True)
+        self._transfer_manager.upload(file_path, self._container, object_name, subscribers=[self._subscriber])
+        self._num_inflight += 1
+
+    def reap(self, block: bool = False) -> None:
+        """Remove the staged files for completed uploads.
+
+        Args:
+            block (bool, optional): Whether to wait for at least one upload to complete, if any are in progress.
+
+        Raises:
+            Exception: The exception of a failed upload. botocore already retries transient errors.
+        """
+        while self._num_inflight > 0:
+            try:
+                future = self._done_queue.get(block=block)
+            except queue.Empty:
+                return
+            block = False
+            self._num_inflight -= 1
+            future.result()
+            os.remove(future.meta.call_args.fileobj)
+
+    def shutdown(self) -> None:
+        """Wait for all uploads to complete, and then shut down the transfer manager."""
+        while self._num_inflight > 0:
+            self.reap(block=True)
+        self._transfer_manager.shutdown()
+
+
+def _encode_file_entry(file_path: str, object_name: str, overwrite: bool) -> bytes:
+    """Encode an upload for a worker pipe, without the overhead of pickling a tuple.
+
+    The entry is the ``overwrite`` flag byte, the ``file_path``, a NUL separator, and the ``object_name``. File paths
+    cannot contain NUL bytes, so the separator is unambiguous.
+    """
+    return (b"\x01" if overwrite else b"\x00") + os.fsencode(file_path) + b"\0" + object_name.encode("utf-8")
+
+
+def _decode_file_entry(entry: bytes) -> Optional[Tuple[str, str, bool]]:
+    """Decode an entry encoded by :func:`_encode_file_entry`. The empty entry is the shutdown sentinel."""
+    if len(entry) == 0:
+        return None
+    file_path, object_name = entry[1:].split(b"\0", 1)
+    return os.fsdecode(file_path), object_name.decode("utf-8"), entry[0] == 1
+
+
+def _increase_http_blocksize(blocksize: int = _HTTP_BLOCKSIZE) -> None:
+    """Increase the default block size that :class:`http.client.HTTPConnection` uses when sending files.
+
+    The default (8 KiB) results in a ``sendall`` per 8 KiB, and, for multithreaded uploads, contention on the GIL
+    between every write. This modifies the defaults for the entire process, so it should only be called in a
+    process dedicated to uploading.
+    """
+    init_defaults = http.client.HTTPConnection.__init__.__defaults__
+    if init_defaults is not None:
+        http.client.HTTPConnection.__init__.__defaults__ = tuple(blocksize if x == 8192 else x for x in init_defaults)
+
+    import urllib3.connection
+
+    # urllib3>=2 overrides the block size with a keyword-only argument
+    init_kwdefaults = urllib3.connection.HTTPConnection.__init__.__kwdefaults__
+    if init_kwdefaults is not None and 'blocksize' in init_kwdefaults:
+        init_kwdefaults['blocksize'] = blocksize
+
+
+class _FileDeque:
+    """A single-producer, single-consumer queue of files for a thread upload worker.
+
+    Unlike :class:`queue.Queue`, appending does not take a lock shared with the consumer, as :class:`collections.deque`
+    appends and pops are atomic. An event wakes up the worker when a file is added.
+    """
+
+    def __init__(self) -> None:
+        self._files: collections.deque[Optional[Tuple[str, str, bool]]] = collections.deque()
+        self._wakeup = threading.Event()
+
+    def put(self, item: Optional[Tuple[str, str, bool]]) -> None:
+        """Add ``item``, which is either a ``(file_path, object_name, overwrite)`` tuple or the shutdown sentinel."""
+        self._files.append(item)
+        self._wakeup.set()
+
+    def get(self, timeout: float) -> Optional[Tuple[str, str, bool]]:
+        """Get the next item, or ``None`` if nothing was added within ``timeout`` seconds."""
+        if len(self._files) == 0:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+        try:
+            return self._files.popleft()
+        except IndexError:
+            return None
+
+    def drain(self) -> List[Tuple[str, str, bool]]:
+        """Remove and return all items, excluding shutdown sentinels."""
+        items: List[Tuple[str, str, bool]] = []
+        while len(self._files) > 0:
+            item = self._files.popleft()
+            if item is not None:
+                items.append(item)
+        return items
+
+
+def _get_next_file(
+    file_queue: Union[_FileDeque, Connection],
+    timeout: float,
+) -> Optional[Tuple[str, str, bool]]:
+    """Get the next ``(file_path, object_name, overwrite)`` tuple from ``file_queue``.
+
+    Returns ``None`` if nothing was received within ``timeout`` seconds, or if the shutdown sentinel was received.
+    """
+    if isinstance(file_queue, _FileDeque):
+        return file_queue.get(timeout)
+    if file_queue.poll(timeout):
+        return _decode_file_entry(file_queue.recv_bytes())
+    return None
+
+
+class _CoalescedBatch:
+    """A tarball of small artifacts that will be uploaded as a single object.
+
+    Args:
+        tar_path (str): Where to write the tarball.
+    """
+
+    def __init__(self, tar_path: str) -> None:
+        self.tar_path = tar_path
+        self.created_at = time.monotonic()
+        self.num_bytes = 0
+        self.index: Dict[str, Dict[str, int]] = {}
+        # Staged files may be hardlinks of the same artifact (see ``staging_mode='link'``). Without ``dereference``, the
+        # second link would be added as a hardlink member, without its contents.
+        self._tar = tarfile.open(tar_path, 'w', dereference=True)
+
+    def add(self, file_path: str, object_name: str) -> None:
+        """Append the staged ``file_path`` to the tarball as ``object_name``, and remove the staged file."""
+        tarinfo = self._tar.gettarinfo(file_path, arcname=object_name)
+        with open(file_path, 'rb') as f:
+            self._tar.addfile(tarinfo, f)
+        # The data is followed by padding to a whole number of blocks
+        padded_size = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        self.index[object_name] = {'offset': self._tar.offset - padded_size, 'size': tarinfo.size}
+        self.num_bytes += tarinfo.size
+        os.remove(file_path)
+
+    def is_ready(self, max_bytes: int) -> bool:
+        """Whether the batch is full, or its oldest artifact has been waiting for too long."""
+        return self.num_bytes >= max_bytes or time.monotonic() - self.created_at >= _COALESCED_BATCH_MAX_AGE
+
+    def close(self, object_name_prefix: str) -> List[Tuple[str, str]]:
+        """Finish the tarball and write its index.
+
+        Args:
+            object_name_prefix (str): The prefix for the object names of the tarball and index.
+
+        Returns:
+            List[Tuple[str, str]]: The ``(file_path, object_name)`` pairs to upload.
+        """
+        self._tar.close()
+        index_path = self.tar_path + '.index.json'
+        with open(index_path, 'w') as f:
+            json.dump(self.index, f)
+        object_name = f"{object_name_prefix}coalesced_artifacts/{uuid.uuid4().hex}"
+        return [(self.tar_path, object_name + '.tar'), (index_path, object_name + '.index.json')]
+
+
+def _is_transient_error(e: Exception) -> bool:
+    """Whether an upload that failed with ``e`` should be retried."""
+    from libcloud.common.types import LibcloudError
+    from requests.exceptions import ConnectionError
+    from urllib3.exceptions import ProtocolError
+
+    if isinstance(e, LibcloudError):
+        # The S3 driver does not encode the error code in an easy-to-parse manner
+        # So first checking if the error code is non-transient
+        return any(x in str(e) for x in ("408", "409", "425", "429", "500", "503", '504'))
+    return isinstance(e, (ProtocolError, TimeoutError, ConnectionError))
+
+
 def _upload_worker(
-    file_queue: Union[queue.Queue[Tuple[str, str, bool]], multiprocessing.JoinableQueue[Tuple[str, str, bool]]],
+    file_queue: Union[_FileDeque, Connection],
     is_finished: Union[multiprocessing._EventType, threading.Event],
+    num_done: ctypes.c_uint64,
     provider: str,
     container: str,
     provider_kwargs: Optional[Dict[str, Any]],
+    use_boto3_transfer: bool = False,
+    tune_http: bool = False,
+    small_file_coalesce_bytes: int = 0,
+    coalesced_object_name_prefix: str = '',
 ):
     """A long-running function to handle uploading files to the object store specified by (``provider``, ``container``,
     ``provider_kwargs``).
 
-    The worker will continuously poll ``file_queue`` for files to upload. Once ``is_finished`` is set, the worker will
-    exit once ``file_queue`` is empty.
+    The worker will continuously poll ``file_queue`` for files to upload. ``file_queue`` is dedicated to this worker,
+    and is either a :class:`_FileDeque` (for threads) or the receiving end of a pipe (for processes). Once
+    ``is_finished`` is set, the worker will exit once ``file_queue`` is empty and all retries have completed. After
+    handling each file, the worker increments ``num_done``, which the logger uses to balance files between workers.
+
+    If ``use_boto3_transfer`` is True, files are uploaded with a :mod:`boto3` transfer manager rather than libcloud,
+    and the worker continues reading ``file_queue`` while uploads are in progress.
+
+    If ``tune_http`` is True, process-wide HTTP settings are tuned for uploads. This should only be set when the worker
+    runs in its own process.
+
+    If ``small_file_coalesce_bytes`` is positive, smaller files are coalesced into tarballs, whose object names begin
+    with ``coalesced_object_name_prefix``. See :class:`ObjectStoreLogger`.
     """
+    # libcloud is only imported when the worker starts, so importing this module does not import it
+    from libcloud.storage.types import ObjectDoesNotExistError
+
+    if tune_http:
+        _increase_http_blocksize()
     object_store = ObjectStore(provider=provider, container=container, provider_kwargs=provider_kwargs)
-    while True:
+    s3_uploader = _S3TransferUploader(provider_kwargs, container) if use_boto3_transfer else None
+
+    # Failed libcloud uploads wait in this heap of (retry time, sequence number, file path, object name, retry count),
+    # rather than in a sleep, so the worker can upload other files in the meantime
+    retry_heap: List[Tuple[float, int, str, str, int]] = []
+    retry_sequence = itertools.count()
+
+    def upload(file_path: str, object_name: str, retry_counter: int = 0):
+        log.info("Uploading file %s to %s://%s/%s", file_path, object_store.provider_name, object_store.container_name,
+                 object_name)
+        if s3_uploader is not None:
+            s3_uploader.submit(file_path, object_name)
+            return
         try:
-            file_path_to_upload, object_name, overwrite = file_queue.get(block=True, timeout=0.5)
-        except queue.Empty:
+            object_store.upload_object(
+                file_path=file_path,
+                object_name=object_name,
+            )
+        except Exception as e:
+            if not _is_transient_error(e) or retry_counter >= _MAX_UPLOAD_RETRIES:
+                raise e
+            retry_counter += 1
+            # exponential backoff with full jitter, so workers that were throttled together do not retry together
+            sleep_time = random.uniform(0, 2**retry_counter)
+            log.warning("Request failed. Retrying in %.2f seconds", sleep_time, exc_info=e, stack_info=True)
+            heapq.heappush(retry_heap,
+                           (time.monotonic() + sleep_time, next(retry_sequence), file_path, object_name, retry_counter))
+            return
+        os.remove(file_path)
+
+    # Object name prefix -> (when it was listed, the names of the objects with that prefix)
+    # Listing a prefix once replaces a HEAD request for every overwrite=False upload under that prefix. Other providers
+    # would list the entire container for every prefix, which is more expensive than the HEAD requests.
+    use_listing = object_store.lists_objects_by_prefix
+    listed_objects: Dict[str, Tuple[float, Set[str]]] = {}
+
+    def object_exists(object_name: str) -> bool:
+        prefix = object_name.rpartition('/')[0]
+        if use_listing and prefix != '':
+            # Objects at the root are checked individually, rather than listing the entire container
+            prefix += '/'
+            listed_at, object_names = listed_objects.get(prefix, (-float('inf'), set()))
+            if time.monotonic() - listed_at > _OBJECT_LISTING_TTL:
+                object_names = set(object_store.list_objects(prefix))
+                listed_objects[prefix] = (time.monotonic(), object_names)
+            return object_name in object_names
+        try:
+            object_store.get_object_size(object_name)
+        except ObjectDoesNotExistError:
+            return False
+        return True
+
+    batch: Optional[_CoalescedBatch] = None
+    while True:
+        while len(retry_heap) > 0 and retry_heap[0][0] <= time.monotonic():
+            _, _, file_path, object_name, retry_counter = heapq.heappop(retry_heap)
+            upload(file_path, object_name, retry_counter)
+        if batch is not None and batch.is_ready(small_file_coalesce_bytes):
+            for file_path, object_name in batch.close(coalesced_object_name_prefix):
+                upload(file_path, object_name)
+            batch = None
+        timeout = 0.5
+        if len(retry_heap) > 0:
+            timeout = min(timeout, max(0.0, retry_heap[0][0] - time.monotonic()))
+        next_file = _get_next_file(file_queue, timeout=timeout)
+        if next_file is None and is_finished.is_set():
+            # Files that were sent just before ``is_finished`` was set may have arrived after the poll timed out
+            next_file = _get_next_file(file_queue, timeout=0)
+        if next_file is None:
+            # Either the poll timed out, or the logger sent the shutdown sentinel
+            if s3_uploader is not None:
+                s3_uploader.reap()
             if is_finished.is_set():
-                break
-            else:
-                continue
-        if not overwrite:
-            try:
-                object_store.get_object_size(object_name)
-            except ObjectDoesNotExistError:
-                # Good! It shouldn't exist.
-                pass
-            else:
+                if batch is not None:
+                    # Upload the last batch before exiting the loop, so that failed uploads are retried
+                    for file_path, object_name in batch.close(coalesced_object_name_prefix):
+                        upload(file_path, object_name)
+                    batch = None
+                if len(retry_heap) == 0:
+                    break
+            continue
+        file_path_to_upload, object_name, overwrite = next_file
+        is_small = small_file_coalesce_bytes > 0 and os.path.getsize(file_path_to_upload) < small_file_coalesce_bytes
+        if overwrite and is_small:
+            if batch is None:
+                batch = _CoalescedBatch(file_path_to_upload + '.tar')
+            batch.add(file_path_to_upload, object_name)
+        else:
+            if not overwrite and object_exists(object_name):
                 # Exceptions will be detected on the next batch_end or epoch_end event
                 raise FileExistsError(
                     textwrap.dedent(f"""\
                     {provider}://{container}/{object_name} already exists,
                     but allow_overwrite was set to False."""))
-        log.info("Uploading file %s to %s://%s/%s", file_path_to_upload, object_store.provider_name,
-                 object_store.container_name, object_name)
-        retry_counter = 0
-        while True:
-            try:
-                object_store.upload_object(
-                    file_path=file_path_to_upload,
-                    object_name=object_name,
-                )
-            except (LibcloudError, ProtocolError, TimeoutError, ConnectionError) as e:
-                if isinstance(e, LibcloudError):
-                    # The S3 driver does not encode the error code in an easy-to-parse manner
-                    # So first checking if the error code is non-transient
-                    is_transient_error = any(x in str(e) for x in ("408", "409", "425", "429", "500", "503", '504'))
-                    if not is_transient_error:
-                        raise e
-                if retry_counter < 4:
-                    retry_counter += 1
-                    # exponential backoff
-                    sleep_time = 2**(retry_counter - 1)
-                    log.warning("Request failed. Sleeping %s seconds and retrying",
-                                sleep_time,
-                                exc_info=e,
-                                stack_info=True)
-                    time.sleep(sleep_time)
-                    continue
-                raise e
-
-            os.remove(file_path_to_upload)
-            file_queue.task_done()
-            break
+            # Record the object, so a later overwrite=False upload of the same name within the TTL is rejected
+            prefix = object_name.rpartition('/')[0] + '/'
+            if prefix in listed_objects:
+                listed_objects[prefix][1].add(object_name)
+            upload(file_path_to_upload, object_name)
+        num_done.value += 1
+    if s3_uploader is not None:
+        s3_uploader.shutdown()
@@ -8,7 +8,6 @@ import textwrap
 from typing import Any, Dict, Iterator, Optional, Union
 
 import yahp as hp
-from libcloud.storage.providers import get_driver
 
 __all__ = ["ObjectStoreHparams", "ObjectStore"]
 
@@ -217,6 +216,9 @@ class ObjectStore:
     """
 
     def __init__(self, provider: str, container: str, provider_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        # Imported lazily, as libcloud is only needed once an object store is used
+        from libcloud.storage.providers import get_driver
+
         provider_cls = get_driver(provider)
         if provider_kwargs is None:
             provider_kwargs = {}
@@ -299,6 +301,33 @@ class ObjectStore:
         """
         return self._get_object(object_name).size
 
+    @property
+    def lists_objects_by_prefix(self) -> bool:
+        """Whether :meth:`list_objects` filters by ``prefix`` on the server.
+
+        This is the case for S3-compatible providers. Other providers may list every object in the container and
+        filter the names locally.
+        """
+        from libcloud.storage.drivers.s3 import BaseS3StorageDriver
+
+        return isinstance(self._provider, BaseS3StorageDriver)
+
+    def list_objects(self, prefix: Optional[str] = None) -> Iterator[str]:
+        """List the names of the objects in the container.
+
+        .. seealso:: :meth:`libcloud.storage.base.StorageDriver.iterate_container_objects` and
+            :attr:`lists_objects_by_prefix`.
+
+        Args:
+            prefix (str, optional): Only list objects whose names begin with this prefix.
+                (default: ``None``, which lists all objects)
+
+        Returns:
+            Iterator[str]: The object names.
+        """
+        for obj in self._provider.iterate_container_objects(self._container, prefix=prefix):
+            yield obj.name
+
     def download_object(self,
                         object_name: str,
                         destination_path: str,
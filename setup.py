@@ -145,6 +145,14 @@ extra_deps["nlp"] = [
     "datasets>=1.14,<2",
 ]
 
+extra_deps["boto3"] = [
+    "boto3>=1.24.84,<2",
+]
+
+extra_deps["xxhash"] = [
+    "xxhash>=3.0.0,<4",
+]
+
 extra_deps["webdataset"] = [
     # PyPI does not permit git dependencies. See https://github.com/mosaicml/composer/issues/771
     # "webdataset @ git+https://github.com/mosaicml/webdataset.git@dev"
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from itertools import product
 
 import pytest
@@ -20,26 +21,67 @@ def generate_parameter_configs(keys, num_replicas=1):
 
     config_combinations = []
     for combo in product(*[config_options[i] for i in keys]):
-        config_combinations.append([dict(zip(keys, combo)) for _ in range(num_replicas)])
+        config = dict(zip(keys, combo))
+        param_id = "-".join(f"{k}={_format_param_value(v)}" for k, v in config.items())
+        # Configs that share a dataset are kept on the same pytest-xdist worker (with `--dist loadgroup`),
+        # so the cached dataset and tokenizers are built only once
+        group = "-".join(f"{k}={_format_param_value(v)}" for k, v in config.items() if k != 'tokenizer_family')
+        config_combinations.append(
+            pytest.param(*[config for _ in range(num_replicas)],
+                         id=param_id,
+                         marks=pytest.mark.xdist_group(name=f"synthetic_lm-{group}")))
     return config_combinations
 
 
-@pytest.fixture
+def _format_param_value(value):
+    if isinstance(value, list):
+        return ",".join(str(x) for x in value)
+    return str(value)
+
+
+# Building the datasets and training the tokenizers is expensive, so they are cached across tests that share a config.
+@lru_cache(maxsize=None)
+def _build_dataset(num_samples, chars_per_sample, column_names):
+    return synthetic_hf_dataset_builder(num_samples=num_samples,
+                                        chars_per_sample=chars_per_sample,
+                                        column_names=list(column_names))
+
+
+@lru_cache(maxsize=None)
+def _build_tokenizer(tmp_path_factory, tokenizer_family, num_samples, chars_per_sample, column_names):
+    dataset = _build_dataset(num_samples, chars_per_sample, column_names)
+    tmp_path = tmp_path_factory.mktemp(f"tokenizer_{tokenizer_family}")
+    return generate_synthetic_tokenizer(tokenizer_family, tmp_path=tmp_path, dataset=dataset)
+
+
+@lru_cache(maxsize=None)
+def _build_tokenized_dataset(tmp_path_factory, tokenizer_family, num_samples, chars_per_sample, column_names):
+    tokenizer = _build_tokenizer(tmp_path_factory, tokenizer_family, num_samples, chars_per_sample, column_names)
+    dataset = _build_dataset(num_samples, chars_per_sample, column_names)
+    max_length = chars_per_sample * 2
+    return dataset.map(
+        lambda inp: tokenizer(text=inp[column_names[0]], padding="max_length", max_length=max_length, truncation=True),
+        batched=True,
+        num_proc=1,
+        keep_in_memory=True)
+
+
+def _dataset_key(config):
+    return config['num_samples'], config['chars_per_sample'], tuple(config['column_names'])
+
+
+@pytest.fixture(scope="session")
 def config(request):
     return request.param
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def dataset(request):
-    print(request.param)
     pytest.importorskip("transformers")
     pytest.importorskip("datasets")
     pytest.importorskip("tokenizers")
 
-    dataset = synthetic_hf_dataset_builder(num_samples=request.param['num_samples'],
-                                           chars_per_sample=request.param['chars_per_sample'],
-                                           column_names=request.param['column_names'])
-    return dataset
+    return _build_dataset(*_dataset_key(request.param))
 
 
 @pytest.mark.parametrize("dataset, config",
@@ -52,25 +94,21 @@ def test_dataset_properties(dataset, config):
     assert dataset.column_names == (config['column_names'] + ['idx'])
 
 
-@pytest.fixture
-def tokenizer(dataset, config, tmp_path):
+@pytest.fixture(scope="session")
+def tokenizer(dataset, config, tmp_path_factory):
+    del dataset  # the dataset fixture performs the import checks
     # build the tokenizer
-    tokenizer = generate_synthetic_tokenizer(config['tokenizer_family'], tmp_path=tmp_path, dataset=dataset)
+    tokenizer = _build_tokenizer(tmp_path_factory, config['tokenizer_family'], *_dataset_key(config))
     # verifying the input ids are a part of the tokenizer
     assert 'input_ids' in tokenizer.model_input_names
     return tokenizer
 
 
-@pytest.fixture
-def tokenized_dataset(tokenizer, dataset, config):
+@pytest.fixture(scope="session")
+def tokenized_dataset(tokenizer, config, tmp_path_factory):
+    del tokenizer  # the tokenizer is built (and cached) by the tokenizer fixture
     # test tokenizing the dataset
-    max_length = config['chars_per_sample'] * 2
-    dataset = dataset.map(lambda inp: tokenizer(
-        text=inp[config['column_names'][0]], padding="max_length", max_length=max_length, truncation=True),
-                          batched=True,
-                          num_proc=1,
-                          keep_in_memory=True)
-    return dataset
+    return _build_tokenized_dataset(tmp_path_factory, config['tokenizer_family'], *_dataset_key(config))
 
 
 @pytest.mark.parametrize("dataset, config",
@@ -1,15 +1,27 @@
 # Copyright 2021 MosaicML. All Rights Reserved.
 
+import http.client
+import http.server
+import json
 import os
 import pathlib
+import shutil
+import socket
+import threading
 import time
+import urllib.parse
+from typing import Dict, List, Tuple, Union
 
 import pytest
+from libcloud.common.types import LibcloudError
 
 from composer.core.event import Event
 from composer.core.state import State
-from composer.loggers import Logger, LogLevel, ObjectStoreLoggerHparams
-from composer.utils.object_store import ObjectStoreHparams
+from composer.loggers import Logger, LogLevel, ObjectStoreLoggerHparams, object_store_logger
+from composer.loggers.object_store_logger import (_HTTP_BLOCKSIZE, _create_s3_client, _decode_file_entry,
+                                                  _encode_file_entry, _FileDeque, _increase_http_blocksize,
+                                                  _S3TransferUploader, _sendfile_put_object, _stage_file)
+from composer.utils.object_store import ObjectStore, ObjectStoreHparams
 
 
 def my_filter_func(state: State, log_level: LogLevel, artifact_name: str):
@@ -17,6 +29,72 @@ def my_filter_func(state: State, log_level: LogLevel, artifact_name: str):
     return False
 
 
+@pytest.fixture
+def local_s3_endpoint():
+    """A plain-HTTP endpoint that stores the body of each PUT request by its path, in place of S3."""
+    objects: Dict[str, bytes] = {}
+
+    class _Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_PUT(self):
+            objects[urllib.parse.urlsplit(self.path).path] = self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            del format, args  # unused
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    provider_kwargs = {
+        "key": "key",
+        "secret": "secret",
+        "host": "127.0.0.1",
+        "port": server.server_address[1],
+        "secure": False,
+        "region": "us-east-1",
+    }
+    yield provider_kwargs, objects
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_object_store_logger(tmpdir: pathlib.Path, dummy_state: State, monkeypatch: pytest.MonkeyPatch):
+    """Returns a function that creates and initializes an :class:`.ObjectStoreLogger` that uploads to a local folder.
+
+    The function takes overrides for the :class:`.ObjectStoreLoggerHparams`, and returns a tuple of the logger destination,
+    a :class:`.Logger` for it, and the folder that it uploads to.
+    """
+    remote_dir = str(tmpdir / "object_store")
+    os.makedirs(remote_dir, exist_ok=True)
+    monkeypatch.setenv("OBJECT_STORE_KEY", remote_dir)  # for the local option, the key is the path
+
+    def create(**kwargs):
+        kwargs.setdefault("num_concurrent_uploads", 1)
+        kwargs.setdefault("use_procs", False)
+        hparams = ObjectStoreLoggerHparams(
+            object_store_hparams=ObjectStoreHparams(provider='local', container=".", key_environ="OBJECT_STORE_KEY"),
+            **kwargs,
+        )
+        destination = hparams.initialize_object()
+        logger = Logger(dummy_state, [destination])
+        destination.run_event(Event.INIT, dummy_state, logger)
+        return destination, logger, remote_dir
+
+    return create
+
+
+def write_file(folder: Union[str, pathlib.Path], name: str, content: str) -> str:
+    file_path = os.path.join(folder, name)
+    with open(file_path, "w+") as f:
+        f.write(content)
+    return file_path
+
+
 def object_store_test_helper(tmpdir: pathlib.Path,
                              dummy_state: State,
                              monkeypatch: pytest.MonkeyPatch,
@@ -101,3 +179,391 @@ def test_object_store_logger_no_overwrite(tmpdir: pathlib.Path, dummy_state: Sta
 def test_object_store_logger_should_log_artifact_filter(tmpdir: pathlib.Path, dummy_state: State,
                                                         monkeypatch: pytest.MonkeyPatch):
     object_store_test_helper(tmpdir=tmpdir, dummy_state=dummy_state, monkeypatch=monkeypatch, should_filter=True)
+
+
+@pytest.mark.parametrize("staging_mode", ["link", "reflink", "copy"])
+def test_object_store_logger_stage_file(tmpdir: pathlib.Path, staging_mode: str):
+    src = os.path.join(tmpdir, "src")
+    dst = os.path.join(tmpdir, "dst")
+    with open(src, "w+") as f:
+        f.write("hello")
+    _stage_file(src, dst, staging_mode)
+    with open(dst, "r") as f:
+        assert f.read() == "hello"
+    assert os.path.samefile(src, dst) == (staging_mode == "link")
+
+
+@pytest.mark.parametrize("object_name_format,expected_object_name", [
+    ("{artifact_name}", "artifact_name"),
+    ("/rank_{rank}/{artifact_name}.bin", "rank_0/artifact_name.bin"),
+    ("{artifact_name}/{artifact_name}", "artifact_name/artifact_name"),
+    ("{artifact_name:>15}", "  artifact_name"),
+])
+def test_object_store_logger_object_name_format(local_object_store_logger, object_name_format: str,
+                                                expected_object_name: str):
+    destination, _, _ = local_object_store_logger(object_name_format=object_name_format)
+    assert destination.get_uri_for_artifact("artifact_name") == f"local://./{expected_object_name}"
+    destination.close()
+    destination.post_close()
+
+
+@pytest.mark.parametrize("staging_mode", ["link", "copy"])
+def test_object_store_logger_small_file_coalescing(tmpdir: pathlib.Path, local_object_store_logger, staging_mode: str):
+    destination, logger, remote_dir = local_object_store_logger(small_file_coalesce_bytes=1024,
+                                                                staging_mode=staging_mode)
+
+    contents = {"artifact_1": "1", "artifact_2": "22"}
+    for artifact_name, content in contents.items():
+        file_path = write_file(tmpdir, artifact_name, content)
+        logger.file_artifact(LogLevel.FIT, artifact_name, file_path, overwrite=True)
+    # Log the first file again. With hardlink staging, both staged files are links to the same inode.
+    logger.file_artifact(LogLevel.FIT, "artifact_3", os.path.join(tmpdir, "artifact_1"), overwrite=True)
+    contents["artifact_3"] = contents["artifact_1"]
+
+    destination.close()
+    destination.post_close()
+
+    # The artifacts should not be uploaded individually
+    for artifact_name in contents:
+        assert not os.path.exists(os.path.join(remote_dir, artifact_name))
+
+    coalesced_dir = os.path.join(remote_dir, "coalesced_artifacts")
+    index_files = [x for x in os.listdir(coalesced_dir) if x.endswith(".index.json")]
+    assert len(index_files) == 1
+    with open(os.path.join(coalesced_dir, index_files[0]), "r") as f:
+        index = json.load(f)
+    with open(os.path.join(coalesced_dir, index_files[0][:-len(".index.json")] + ".tar"), "rb") as f:
+        tarball = f.read()
+    assert index.keys() == contents.keys()
+    for artifact_name, content in contents.items():
+        offset, size = index[artifact_name]["offset"], index[artifact_name]["size"]
+        assert tarball[offset:offset + size].decode() == content
+
+
+@pytest.mark.timeout(5)
+def test_object_store_logger_dedupe_by_content(tmpdir: pathlib.Path, local_object_store_logger):
+    pytest.importorskip("xxhash")
+    destination, logger, remote_dir = local_object_store_logger(dedupe_by_content=True)
+
+    file_path = write_file(tmpdir, "file", "1")
+    logger.file_artifact(LogLevel.FIT, "artifact_name", file_path, overwrite=True)
+
+    artifact_file = os.path.join(remote_dir, "artifact_name")
+    while not os.path.exists(artifact_file):
+        time.sleep(0.1)
+    os.remove(artifact_file)
+
+    # The contents are unchanged, so the artifact should not be uploaded again
+    logger.file_artifact(LogLevel.FIT, "artifact_name", file_path, overwrite=True)
+    destination.close()
+    destination.post_close()
+    assert not os.path.exists(artifact_file)
+
+
+@pytest.mark.timeout(10)
+def test_s3_transfer_uploader(tmpdir: pathlib.Path, local_s3_endpoint):
+    pytest.importorskip("boto3")
+    provider_kwargs, objects = local_s3_endpoint
+    uploader = _S3TransferUploader(provider_kwargs, "bucket", max_inflight=2)
+    # Upload through the transfer manager, rather than with sendfile
+    uploader._use_sendfile = False
+
+    file_paths = []
+    for i in range(5):
+        file_path = os.path.join(tmpdir, f"file_{i}")
+        with open(file_path, "w+") as f:
+            f.write(str(i))
+        file_paths.append(file_path)
+        uploader.submit(file_path, f"artifact_{i}")
+    uploader.reap()
+    uploader.shutdown()
+
+    assert objects == {f"/bucket/artifact_{i}": str(i).encode() for i in range(5)}
+    # The staged files are removed once uploaded
+    for file_path in file_paths:
+        assert not os.path.exists(file_path)
+
+
+@pytest.mark.timeout(5)
+@pytest.mark.filterwarnings(r"ignore:((.|\n)*)FileExistsError((.|\n)*):pytest.PytestUnhandledThreadExceptionWarning")
+def test_object_store_logger_post_close_raises_if_not_uploaded(tmpdir: pathlib.Path, local_object_store_logger):
+    destination, logger, remote_dir = local_object_store_logger()
+
+    file_path = write_file(tmpdir, "file", "1")
+    logger.file_artifact(LogLevel.FIT, "artifact_1", file_path, overwrite=True)
+    logger.file_artifact(LogLevel.FIT, "artifact_1", file_path, overwrite=False)
+    # The worker crashes, as artifact_1 already exists
+    while destination._workers[0].is_alive():
+        time.sleep(0.1)
+
+    # With no live workers, the artifact cannot be dispatched
+    logger.file_artifact(LogLevel.FIT, "artifact_2", file_path, overwrite=True)
+    destination.close()
+    with pytest.raises(RuntimeError, match="were not uploaded"):
+        destination.post_close()
+    assert not os.path.exists(os.path.join(remote_dir, "artifact_2"))
+
+
+def test_object_store_logger_shared_staging_folder(tmpdir: pathlib.Path, monkeypatch: pytest.MonkeyPatch,
+                                                   local_object_store_logger):
+    staged_paths = []
+
+    def stage_file(src: str, dst: str, staging_mode: str):
+        del staging_mode  # unused
+        staged_paths.append(dst)
+        shutil.copy2(src, dst)
+
+    monkeypatch.setattr(object_store_logger, "_stage_file", stage_file)
+
+    # Two loggers that share a staging folder
+    loggers = [
+        local_object_store_logger(
+            object_name_format=f"logger_{i}/{{artifact_name}}",
+            upload_staging_folder=str(tmpdir / "staging"),
+            staging_mode="copy",
+        ) for i in range(2)
+    ]
+
+    for i, (_, logger, _) in enumerate(loggers):
+        file_path = write_file(tmpdir, f"file_{i}", str(i))
+        logger.file_artifact(LogLevel.FIT, "artifact_name", file_path, overwrite=True)
+    for destination, _, _ in loggers:
+        destination.close()
+        destination.post_close()
+
+    remote_dir = loggers[0][2]
+    assert len(set(staged_paths)) == 2
+    for i in range(2):
+        with open(os.path.join(remote_dir, f"logger_{i}", "artifact_name"), "r") as f:
+            assert f.read() == str(i)
+
+
+@pytest.mark.timeout(10)
+def test_sendfile_put_object(tmpdir: pathlib.Path, local_s3_endpoint):
+    pytest.importorskip("boto3")
+    provider_kwargs, objects = local_s3_endpoint
+    file_path = os.path.join(tmpdir, "file")
+    with open(file_path, "w+") as f:
+        f.write("hello")
+    assert _sendfile_put_object(_create_s3_client(provider_kwargs), file_path, "bucket", "artifact_name")
+    assert objects == {"/bucket/artifact_name": b"hello"}
+
+
+@pytest.mark.timeout(10)
+def test_sendfile_put_object_timeout(tmpdir: pathlib.Path):
+    boto3 = pytest.importorskip("boto3")
+    from botocore.config import Config
+
+    # The kernel accepts connections to this socket, but it never responds
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        client = boto3.client(
+            "s3",
+            aws_access_key_id="key",
+            aws_secret_access_key="secret",
+            region_name="us-east-1",
+            endpoint_url=f"http://127.0.0.1:{server.getsockname()[1]}",
+            config=Config(connect_timeout=1, read_timeout=1),
+        )
+        file_path = os.path.join(tmpdir, "file")
+        with open(file_path, "w+") as f:
+            f.write("hello")
+        assert not _sendfile_put_object(client, file_path, "bucket", "artifact_name")
+
+
+@pytest.mark.timeout(10)
+def test_object_store_logger_retries_coalesced_batch(tmpdir: pathlib.Path, monkeypatch: pytest.MonkeyPatch,
+                                                     local_object_store_logger):
+    # The first attempt to upload each object fails with a transient error
+    attempted_object_names = []
+    original_upload_object = ObjectStore.upload_object
+
+    def upload_object(self: ObjectStore, file_path: str, object_name: str, *args, **kwargs):
+        attempted_object_names.append(object_name)
+        if attempted_object_names.count(object_name) == 1:
+            raise LibcloudError("503")
+        original_upload_object(self, file_path, object_name, *args, **kwargs)
+
+    monkeypatch.setattr(ObjectStore, "upload_object", upload_object)
+
+    # Record the backoff, but retry quickly
+    backoff_ranges: List[Tuple[float, float]] = []
+
+    def uniform(a: float, b: float):
+        backoff_ranges.append((a, b))
+        return 0.1
+
+    monkeypatch.setattr(object_store_logger.random, "uniform", uniform)
+
+    staging_folder = str(tmpdir / "staging")
+    destination, logger, remote_dir = local_object_store_logger(upload_staging_folder=staging_folder,
+                                                                small_file_coalesce_bytes=100)
+
+    file_path = write_file(tmpdir, "file", "1")
+    # The batch is not full, so it is uploaded on shutdown
+    logger.file_artifact(LogLevel.FIT, "artifact_name", file_path, overwrite=True)
+    destination.close()
+    destination.post_close()
+
+    # The tarball and its index are each retried once, after a backoff of up to 2 seconds
+    assert len(attempted_object_names) == 4
+    assert backoff_ranges == [(0, 2), (0, 2)]
+    coalesced_files = os.listdir(os.path.join(remote_dir, "coalesced_artifacts"))
+    assert sorted(x.rsplit(".", 1)[-1] for x in coalesced_files) == ["json", "tar"]
+    assert os.listdir(staging_folder) == []
+
+
+@pytest.mark.timeout(5)
+@pytest.mark.filterwarnings(r"ignore:((.|\n)*)FileExistsError((.|\n)*):pytest.PytestUnhandledThreadExceptionWarning")
+def test_object_store_logger_no_overwrite_listing(tmpdir: pathlib.Path, dummy_state: State,
+                                                  monkeypatch: pytest.MonkeyPatch, local_object_store_logger):
+    # The local provider does not filter listings by prefix on the server, so the logger would check each object
+    # individually. Pretend that it does, to test the listing.
+    assert not ObjectStore(provider="local", container=".", provider_kwargs={
+        "key": str(tmpdir)
+    }).lists_objects_by_prefix
+    monkeypatch.setattr(ObjectStore, "lists_objects_by_prefix", property(lambda self: True))
+    listed_prefixes = []
+    original_list_objects = ObjectStore.list_objects
+
+    def list_objects(self: ObjectStore, prefix: str):
+        listed_prefixes.append(prefix)
+        return original_list_objects(self, prefix)
+
+    def get_object_size(self: ObjectStore, object_name: str):
+        raise AssertionError(f"{object_name} should be checked against the listing")
+
+    monkeypatch.setattr(ObjectStore, "list_objects", list_objects)
+    monkeypatch.setattr(ObjectStore, "get_object_size", get_object_size)
+
+    destination, logger, remote_dir = local_object_store_logger(object_name_format="run/{artifact_name}")
+    os.makedirs(os.path.join(remote_dir, "run"))
+    write_file(os.path.join(remote_dir, "run"), "existing", "existing")
+
+    file_path = write_file(tmpdir, "file", "1")
+    logger.file_artifact(LogLevel.FIT, "new", file_path, overwrite=False)
+    # The worker crashes, as the listing contains this object
+    logger.file_artifact(LogLevel.FIT, "existing", file_path, overwrite=False)
+    while destination._workers[0].is_alive():
+        time.sleep(0.1)
+    with pytest.raises(RuntimeError):
+        destination.run_event(Event.BATCH_END, dummy_state, logger)
+    destination.close()
+    destination.post_close()
+
+    # The prefix is listed once, and the listing is reused for the second artifact
+    assert listed_prefixes == ["run/"]
+    with open(os.path.join(remote_dir, "run", "new"), "r") as f:
+        assert f.read() == "1"
+    with open(os.path.join(remote_dir, "run", "existing"), "r") as f:
+        assert f.read() == "existing"
+
+
+@pytest.mark.parametrize("file_path,object_name,overwrite", [
+    ("/tmp/staging/abc-0", "artifact_name", True),
+    ("/tmp/staging/abc-1", "rank_0/ep0-ba1/ümlaut.pt", False),
+    ("/tmp/staging/abc-2", "name/with\x00nul", True),
+])
+def test_file_entry_round_trip(file_path: str, object_name: str, overwrite: bool):
+    entry = _encode_file_entry(file_path, object_name, overwrite)
+    assert _decode_file_entry(entry) == (file_path, object_name, overwrite)
+
+
+def test_file_entry_shutdown_sentinel():
+    assert _decode_file_entry(b"") is None
+
+
+@pytest.mark.timeout(5)
+def test_file_deque():
+    file_deque = _FileDeque()
+    # Nothing was added, so get times out
+    start = time.monotonic()
+    assert file_deque.get(timeout=0.2) is None
+    assert time.monotonic() - start >= 0.2
+
+    # A put from another thread wakes up the consumer before the timeout
+    item = ("file_path", "object_name", True)
+    producer = threading.Timer(0.1, file_deque.put, args=(item,))
+    producer.start()
+    start = time.monotonic()
+    assert file_deque.get(timeout=4) == item
+    assert time.monotonic() - start < 4
+    producer.join()
+
+    # Items are returned in order, followed by the shutdown sentinel
+    items = [(f"file_path_{i}", f"object_name_{i}", False) for i in range(3)]
+    for x in items:
+        file_deque.put(x)
+    file_deque.put(None)
+    assert [file_deque.get(timeout=0) for _ in range(3)] == items
+    # The sentinel is returned without waiting for the timeout
+    start = time.monotonic()
+    assert file_deque.get(timeout=4) is None
+    assert time.monotonic() - start < 4
+
+
+def test_file_deque_drain():
+    file_deque = _FileDeque()
+    items = [(f"file_path_{i}", f"object_name_{i}", True) for i in range(3)]
+    for x in items:
+        file_deque.put(x)
+    file_deque.put(None)
+    # Sentinels are excluded
+    assert file_deque.drain() == items
+    assert file_deque.get(timeout=0) is None
+
+
+@pytest.mark.timeout(30)
+def test_object_store_logger_post_close_worker_crashes_with_full_pipe(tmpdir: pathlib.Path, local_object_store_logger):
+    destination, logger, remote_dir = local_object_store_logger(use_procs=True)
+    write_file(remote_dir, "existing", "existing")
+
+    # Keep the worker busy with a large artifact, so post_close starts while the worker is still alive
+    large_file_path = os.path.join(tmpdir, "large_file")
+    with open(large_file_path, "wb") as f:
+        f.truncate(512 * 1024 * 1024)
+    logger.file_artifact(LogLevel.FIT, "large_artifact", large_file_path, overwrite=True)
+
+    file_path = write_file(tmpdir, "file", "1")
+    # The worker crashes on the next artifact, as it already exists. The remaining artifacts, which have long names,
+    # fill its pipe.
+    logger.file_artifact(LogLevel.FIT, "existing", file_path, overwrite=False)
+    for i in range(300):
+        logger.file_artifact(LogLevel.FIT, f"{'a' * 2000}_{i}", file_path, overwrite=True)
+    destination.close()
+    # post_close should not block on the full pipe of the crashed worker
+    with pytest.raises(RuntimeError, match="were not uploaded"):
+        destination.post_close()
+
+
+@pytest.fixture
+def restore_http_blocksize(monkeypatch: pytest.MonkeyPatch):
+    """Restore the default HTTP block sizes, which :func:`_increase_http_blocksize` modifies process-wide."""
+    import urllib3.connection
+
+    init_defaults = http.client.HTTPConnection.__init__.__defaults__
+    monkeypatch.setattr(http.client.HTTPConnection.__init__, "__defaults__", init_defaults)
+    init_kwdefaults = urllib3.connection.HTTPConnection.__init__.__kwdefaults__
+    if init_kwdefaults is not None and "blocksize" in init_kwdefaults:
+        monkeypatch.setitem(init_kwdefaults, "blocksize", init_kwdefaults["blocksize"])
+
+
+def test_increase_http_blocksize(restore_http_blocksize):
+    del restore_http_blocksize  # unused
+    import urllib3.connection
+
+    _increase_http_blocksize()
+    assert http.client.HTTPConnection("localhost").blocksize == _HTTP_BLOCKSIZE
+    assert urllib3.connection.HTTPConnection("localhost").blocksize == _HTTP_BLOCKSIZE
+
+
+def test_object_store_logger_threads_do_not_tune_http(tmpdir: pathlib.Path, dummy_state: State,
+                                                      monkeypatch: pytest.MonkeyPatch, restore_http_blocksize):
+    del restore_http_blocksize  # unused
+    import urllib3.connection
+
+    http_blocksize = http.client.HTTPConnection("localhost").blocksize
+    urllib3_blocksize = urllib3.connection.HTTPConnection("localhost").blocksize
+    # Thread workers share the training process, so they should not modify its HTTP defaults
+    object_store_test_helper(tmpdir=tmpdir, dummy_state=dummy_state, monkeypatch=monkeypatch, use_procs=False)
+    assert http.client.HTTPConnection("localhost").blocksize == http_blocksize
+    assert urllib3.connection.HTTPConnection("localhost").blocksize == urllib3_blocksize